@@ -0,0 +1,78 @@
+from datetime import date
+from pathlib import Path
+
+import website_check as wc
+
+TODAY = date(2026, 10, 15)
+FIXTURE = Path(__file__).parent / "fixtures" / "fund_page.html"
+
+ROW = '<div class="col-12 col-md-6 fund-stat fund-stat--compact"><span class="fund-stat__label text-muted">Label</span> <span class="fund-stat__value fw-bold">$1.00</span></div>'
+
+
+def section(title, body):
+    return f'<section class="fund-section container"><h2 class="fund-section__title">{title}</h2><div class="fund-section__body row">{body}</div></section>'
+
+
+def page(*sections):
+    return "<html><body><main>" + "".join(sections) + "</main></body></html>"
+
+
+def scan(html):
+    return wc.scan_dates(html) or wc.scan_dates_dom(html)
+
+
+def nav_date(html):
+    nav_res, _, _ = wc.classify(scan(html), TODAY)
+    return nav_res[0] if nav_res else None
+
+
+HOLDINGS = section("Top Holdings", '<div><span>Date as of 15 Oct 2026</span></div>')
+
+
+def test_fixture_regex_and_dom_agree():
+    html = wc.main_region(FIXTURE.read_text())
+    fast = wc.scan_dates(html)
+    dom = wc.scan_dates_dom(html)
+    assert fast is not None
+    assert {x[0] for x in fast} == {x[0] for x in dom}
+    # Every regex entry is the DOM entry for the same label; the DOM scan also
+    # adds its outer wrappers, whose context reaches the whole page
+    assert set(fast) <= set(dom)
+
+
+def test_fixture_classification():
+    nav_res, perf_res, hold_res = wc.classify(wc.scan_dates(wc.main_region(FIXTURE.read_text())), TODAY)
+    assert nav_res[0] == date(2026, 10, 14)
+    assert perf_res[0] == date(2026, 9, 30)
+    assert hold_res[0] == date(2026, 10, 15)
+
+
+def test_heading_beyond_window_falls_back_to_dom():
+    html = page(section("Net Asset Value", ROW + ROW + '<div><span>Data as of 14 Oct 2026</span></div>'))
+    assert wc.scan_dates(html) is None
+    assert nav_date(html) == date(2026, 10, 14)
+
+
+def test_split_tags_fall_back_to_dom():
+    html = page(section("Net Asset Value", '<div class="fund-stat"><div><span>Data as of</span> <span>14 Oct 2026</span></div></div>'), HOLDINGS)
+    assert wc.scan_dates(html) is None
+    assert nav_date(html) == date(2026, 10, 14)
+
+
+def test_as_and_of_in_different_elements():
+    html = page(section("Net Asset Value", '<div class="fund-stat"><div><span>Data as</span> <span>of 14 Oct 2026</span></div></div>'), HOLDINGS)
+    assert nav_date(html) == date(2026, 10, 14)
+
+
+def test_nbsp_date_falls_back_to_dom():
+    html = page(section("Net Asset Value", '<div><span>Data as of 14&nbsp;Oct&nbsp;2026</span></div>'), HOLDINGS)
+    assert wc.scan_dates(html) is None
+    assert nav_date(html) == date(2026, 10, 14)
+
+
+def test_script_and_free_text_are_ignored():
+    html = page(
+        '<script>window.fund = {"label": "NAV as of 16 Oct 2026"};</script>',
+        section("Net Asset Value", '<div><span>NAV as of 13 Oct 2026</span><span>Date as of 14 Oct 2026</span></div>'),
+    )
+    assert nav_date(html) == date(2026, 10, 14)
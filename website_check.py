@@ -1,12 +1,16 @@
 # app.py
 import streamlit as st
-import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
 import pandas as pd
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+import numpy as np
+from selectolax.lexbor import LexborHTMLParser
+from datetime import date, datetime, timedelta
 import pytz
 import re
 import concurrent.futures
+import time
+from functools import lru_cache
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="Global X Monitor", page_icon="📊", layout="wide")
@@ -17,111 +21,206 @@ st.markdown("Live tracking of NAV, Performance, Holdings, and Distribution updat
 BASE_URL = "https://www.globalxetfs.com.au/funds/"
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
 SYD_TZ = pytz.timezone('Australia/Sydney')
-EXCEPTION_FUNDS = ['USTB', 'BCOM', 'USIG']
+EXCEPTION_FUNDS = frozenset(['USTB', 'BCOM', 'USIG'])
 FORCE_LIST = ['ETPMAG', 'ETPMPD', 'ETPMPM', 'ETPMPT']
 
+MAX_WORKERS = 32
+# How long a fund's parsed result and a fetched page are reused before RUN CHECK refetches
+FUND_CACHE_TTL = 30 * 60
+PAGE_CACHE_TTL = 60 * 60
+TIMING_COLS = ['fetch_ms', 'parse_ms', 'classify_ms']
+PROFILE_COLS = TIMING_COLS + ['from_cache']
+
+# Shared session: every request hits the same host, so reuse pooled connections
+# (one kept-alive connection per worker, no handshake after the first round).
+# Pages are kept in a local SQLite cache so reruns within the hour skip the network.
+# Expired pages are never served when the site is down, so an outage still shows as ❌ Error.
+SESSION = requests_cache.CachedSession('globalx_cache', expire_after=PAGE_CACHE_TTL, allowable_methods=['GET'])
+SESSION.headers.update(HEADERS)
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=MAX_WORKERS, pool_block=True, max_retries=1))
+
+# Raw-HTML date sweep: a whole text node reading "[Date|Data] as of d Mon YYYY",
+# plus a window of surrounding markup (tags stripped) used as the classification context
+AS_OF_RE = re.compile(r'(?i)>\s*(?:date|data)\s+as\s+of\s+(\d{1,2}\s+[A-Za-z]{3}\s+\d{4})\s*(?:,[^<]*)?<')
+SCRIPT_RE = re.compile(r'(?is)<(script|style)\b.*?</\1\s*>')
+TAG_RE = re.compile(r'<[^>]*(?:>|$)|^[^<]*>')
+CTX_BEFORE, CTX_AFTER = 400, 100
+# The after-window ends at the next block, which opens with the following section's heading
+BLOCK_OPEN_RE = re.compile(r'(?i)<(?:h[1-6]|div|section|article|table|tr|ul|li|p)\b')
+# "as of" as it reads in the page text, where tags may sit either side of the space
+AS_OF_TEXT_RE = re.compile(r'(?i)as(?:<[^>]*>)* (?:<[^>]*>)*of')
+DATE_PREFIX_RE = re.compile(r'(?i)(date|data)\s+as\s+of\s+')
+TICKER_RE = re.compile(r"/funds/([a-zA-Z0-9]{3,6})/")
+MONTHS = {m: i for i, m in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
 # --- CORE LOGIC (V21 STRICT ENGLISH & NAV LOGIC) ---
 def parse_date(text):
     try:
         # Regex to extract date format like "24 Nov 2025"
-        cln = re.sub(r'(?i)(date|data)\s+as\s+of\s+', '', text).strip().split(',')[0].strip()
-        return datetime.strptime(cln, '%d %b %Y').date(), cln
+        cln = DATE_PREFIX_RE.sub('', text).strip().split(',', 1)[0].strip()
+        try:
+            d, mon, y = cln.split()
+            return date(int(y), MONTHS[mon[:3].lower()], int(d)), cln
+        except (ValueError, KeyError):
+            return datetime.strptime(cln, '%d %b %Y').date(), cln
     except: return None, text
 
-def get_expectations(ticker):
-    now_syd = datetime.now(SYD_TZ).date()
-    # Calculate previous month end for Distributions
-    first = now_syd.replace(day=1)
-    last_month = first - timedelta(days=1)
-    while last_month.weekday() > 4: last_month -= timedelta(days=1)
-    
+# Only depends on the day and the fund's rule set, so it's worked out once per run
+@lru_cache(maxsize=4)
+def get_expectations(now_syd, is_exception):
     # Business Rules: Exceptions are T-2, Standards are T-1
-    if ticker.upper() in EXCEPTION_FUNDS:
-        return get_last_bd(now_syd, 2), get_last_bd(now_syd, 1), last_month
+    if is_exception:
+        return get_last_bd(now_syd, 2), get_last_bd(now_syd, 1)
     else:
-        return get_last_bd(now_syd, 1), now_syd, last_month
+        return get_last_bd(now_syd, 1), now_syd
+
+def get_last_month_end(now_syd):
+    # Previous month end (last business day) for Distributions, same for every fund
+    first = now_syd.replace(day=1)
+    return np.busday_offset(np.datetime64(first - timedelta(days=1), 'D'), 0, roll='backward').item()
 
 def get_last_bd(d, n):
-    curr = d
-    c = 0
-    while c < n:
-        curr -= timedelta(days=1)
-        if curr.weekday() < 5: c += 1
-    return curr
+    # Weekend dates roll forward to Monday first, so Sat/Sun minus 1 BD is Friday
+    return np.busday_offset(np.datetime64(d, 'D'), -n, roll='forward').item()
 
 @st.cache_data(ttl=3600)
-def get_all_tickers():
+def get_all_tickers(_force_refresh=False):
     try:
-        r = requests.get(BASE_URL, headers=HEADERS)
-        matches = re.findall(r"/funds/([a-zA-Z0-9]{3,6})/", r.text)
+        r = SESSION.get(BASE_URL, force_refresh=_force_refresh)
+        matches = TICKER_RE.findall(r.text)
         candidates = set([m.upper() for m in matches])
         for f in FORCE_LIST: candidates.add(f)
         BLACKLIST = ['INDEX', 'ABOUT', 'MEDIA', 'LOGIN', 'TERMS', 'PRIVACY', 'ADMIN', 'FUNDS']
         return sorted([t for t in candidates if t not in BLACKLIST and len(t) >= 3])
     except: return FORCE_LIST + ['ACDC', 'BANK']
 
-def check_fund(ticker):
+# Context keyword flags, worked out once per date while scanning
+F_NAV, F_RET, F_HOLD = 1, 2, 4
+
+def ctx_flags(ctx):
+    flags = 0
+    if "nav" in ctx or "net asset" in ctx: flags |= F_NAV
+    if "return" in ctx: flags |= F_RET
+    if "holding" in ctx or "characteristics" in ctx: flags |= F_HOLD
+    return flags
+
+def main_region(html):
+    # Fund data sits inside <main>; skip the header/nav/footer markup when it's there
+    start = html.find('<main')
+    end = html.find('</main>', start) if start != -1 else -1
+    return html[start:end] if end != -1 else html
+
+def scan_dates(html):
+    # Fast path: regex over the raw page, no DOM. Returns None when the page needs
+    # the DOM scan: an "as of" the regex can't read (split across tags, &nbsp;, ...)
+    # or a date whose window holds no section keyword.
+    html = SCRIPT_RE.sub(' ', html)
+    all_dates = []
+    matches = list(AS_OF_RE.finditer(html))
+    if len(AS_OF_TEXT_RE.findall(html)) > len(matches): return None
+    for i, m in enumerate(matches):
+        dt, s = parse_date(m.group(1))
+        if dt:
+            # Window starts no earlier than the previous match and stops at the first
+            # block-opening tag after the date, so the next section's heading isn't read
+            start = max(0, m.start() - CTX_BEFORE, matches[i - 1].end() if i else 0)
+            end = min(m.end() + CTX_AFTER, matches[i + 1].start() if i + 1 < len(matches) else len(html))
+            nxt = BLOCK_OPEN_RE.search(html, m.end(), end)
+            if nxt: end = nxt.start()
+            flags = ctx_flags(TAG_RE.sub(' ', html[start:end]).lower())
+            if not flags: return None
+            all_dates.append((dt, s, flags))
+    return all_dates
+
+def scan_dates_dom(html):
+    # Fallback for pages where the date is split across tags
+    tree = LexborHTMLParser(html)
+    all_dates = []
+    # Let Lexbor find the elements whose own text carries "as of", then keep every
+    # span/div around them too: a wrapper is the only node that parses when the
+    # date is split across tags, and its wider context holds the section keyword
+    if any('<' in m.group() for m in AS_OF_TEXT_RE.finditer(html)):
+        # "as" and "of" sit in different elements, which the selector can't see
+        candidates = [c for c in tree.css('span, div') if "as of" in c.text().lower()]
+    else:
+        keep = set()
+        for node in tree.css('*:lexbor-contains("as of" i)'):
+            while node is not None:
+                if node.tag in ('span', 'div'): keep.add(node.mem_id)
+                node = node.parent
+        candidates = [c for c in tree.css('span, div') if c.mem_id in keep]
+    for c in candidates:
+        dt, s = parse_date(c.text())
+        if dt:
+            # Get deep context (Parent + Grandparent text), walking the tree once
+            p = c.parent
+            g = p.parent if p else None
+            gg = g.parent if g else None
+            pt = g.text(separator=" ", strip=True).lower() if g else ""
+            gt = gg.text(separator=" ", strip=True).lower() if gg else ""
+            all_dates.append((dt, s, ctx_flags(pt + " " + gt)))
+    return all_dates
+
+def classify(all_dates, as_of_date):
+    nav_res, perf_res, hold_res = None, None, None
+
+    # Single pass over all dates:
+    # 1. NAV (STRICT) - "NAV" keywords, no "Holding" keywords, and the date
+    #    CANNOT be Today (NAV is always T-1 or T-2)
+    # 2. Performance - "return" keyword
+    # 3. Holdings - "holding"/"characteristics" keywords, no "return"
+    for x in all_dates:
+        dt, _, flags = x
+        # Skip NAV if date is Today (False Positive from Holdings)
+        if flags & F_NAV and not flags & F_HOLD and dt != as_of_date and (nav_res is None or dt > nav_res[0]): nav_res = x
+        if flags & F_RET and (perf_res is None or dt > perf_res[0]): perf_res = x
+        if flags & F_HOLD and not flags & F_RET and (hold_res is None or dt > hold_res[0]): hold_res = x
+    return nav_res, perf_res, hold_res
+
+def new_report(ticker):
+    return {'Ticker': ticker, 'NAV': 'Checking...', 'Holdings': 'Checking...', 'Perf': 'Checking...', 'Dist': 'Checking...'}
+
+# Cached per (ticker, Sydney date) so a repeat RUN CHECK doesn't rescan; FORCE
+# REFRESH clears it and refetches past requests-cache. Errors are raised rather
+# than reported so a failed fetch is never cached.
+@st.cache_data(ttl=FUND_CACHE_TTL, show_spinner=False)
+def check_fund(ticker, as_of_date, exp_dist_s, _force_refresh=False):
     url = f"{BASE_URL}{ticker.lower()}/"
-    exp_nav, exp_hold, exp_dist = get_expectations(ticker)
-    # Important: NAV cannot be TODAY. It must be T-1 or older.
-    today_date = datetime.now(SYD_TZ).date()
+    # Important: NAV cannot be TODAY (as_of_date). It must be T-1 or older.
+    exp_nav, exp_hold = get_expectations(as_of_date, ticker.upper() in EXCEPTION_FUNDS)
 
-    report = {'Ticker': ticker, 'NAV': 'Checking...', 'Holdings': 'Checking...', 'Perf': 'Checking...', 'Dist': 'Checking...'}
-    
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(r.text, 'html.parser')
-
-        all_dates = []
-        candidates = soup.find_all(['span', 'div'])
-        for c in candidates:
-            if "as of" in c.get_text().lower():
-                dt, s = parse_date(c.get_text())
-                if dt:
-                    # Get deep context (Parent + Grandparent text)
-                    pt = c.parent.parent.get_text(" ", strip=True).lower() if c.parent and c.parent.parent else ""
-                    gt = c.parent.parent.parent.get_text(" ", strip=True).lower() if c.parent and c.parent.parent and c.parent.parent.parent else ""
-                    all_dates.append({'dt': dt, 's': s, 'ctx': pt + " " + gt})
-
-        nav_res, perf_res, hold_res = None, None, None
-        
-        # 1. NAV Logic (STRICT)
-        # - Must contain "NAV" keywords
-        # - Must NOT contain "Holding" keywords
-        # - Date CANNOT be Today (NAV is always T-1 or T-2)
-        for x in all_dates:
-            ctx = x['ctx']
-            if ("nav" in ctx or "net asset" in ctx) and ("holding" not in ctx) and ("characteristics" not in ctx):
-                if x['dt'] == today_date:
-                    continue # Skip if date is Today (False Positive from Holdings)
-                if nav_res is None or x['dt'] > nav_res['dt']: nav_res = x
-        
-        # 2. Performance Logic
-        for x in all_dates:
-            if "return" in x['ctx']:
-                if perf_res is None or x['dt'] > perf_res['dt']: perf_res = x
-
-        # 3. Holdings Logic
-        for x in all_dates:
-            if ("holding" in x['ctx'] or "characteristics" in x['ctx']) and "return" not in x['ctx']:
-                if hold_res is None or x['dt'] > hold_res['dt']: hold_res = x
-
-        # Formatting Results
-        if nav_res: report['NAV'] = f"✅ {nav_res['s']}" if nav_res['dt'] >= exp_nav else f"🔴 {nav_res['s']} (Late)"
-        else: report['NAV'] = "⚠️ Missing"
-
-        if perf_res: report['Perf'] = f"✅ {perf_res['s']}" if perf_res['dt'] >= exp_nav else f"🔴 {perf_res['s']} (Late)"
-        else: report['Perf'] = "⚠️ Missing"
-
-        if hold_res: report['Holdings'] = f"✅ {hold_res['s']}" if hold_res['dt'] >= exp_hold else f"🔴 {hold_res['s']} (Late)"
-        else: report['Holdings'] = "⚠️ Missing"
-
-        # Distribution Check
-        exp_s = exp_dist.strftime('%d %b %Y')
-        if exp_s in soup.get_text(): report['Dist'] = f"✅ {exp_s}"
-        else: report['Dist'] = "⚠️ Missing"
-
-    except: report['NAV'] = "❌ Error"
+    report = new_report(ticker)
+    t0 = time.perf_counter()
+    r = SESSION.get(url, timeout=10, force_refresh=_force_refresh)
+    html = r.text
+    t1 = time.perf_counter()
+    # (date, date string, context keyword flags) per "as of" match
+    body = main_region(html)
+    all_dates = scan_dates(body) or scan_dates_dom(body)
+    t2 = time.perf_counter()
+
+    nav_res, perf_res, hold_res = classify(all_dates, as_of_date)
+
+    # Formatting Results
+    if nav_res: report['NAV'] = f"✅ {nav_res[1]}" if nav_res[0] >= exp_nav else f"🔴 {nav_res[1]} (Late)"
+    else: report['NAV'] = "⚠️ Missing"
+
+    if perf_res: report['Perf'] = f"✅ {perf_res[1]}" if perf_res[0] >= exp_nav else f"🔴 {perf_res[1]} (Late)"
+    else: report['Perf'] = "⚠️ Missing"
+
+    if hold_res: report['Holdings'] = f"✅ {hold_res[1]}" if hold_res[0] >= exp_hold else f"🔴 {hold_res[1]} (Late)"
+    else: report['Holdings'] = "⚠️ Missing"
+
+    # Distribution Check
+    # Plain substring test on the raw page, no parse needed
+    if exp_dist_s in html: report['Dist'] = f"✅ {exp_dist_s}"
+    else: report['Dist'] = "⚠️ Missing"
+
+    # Per-stage timings for the Profile panel
+    t3 = time.perf_counter()
+    report.update(zip(TIMING_COLS, ((t1 - t0) * 1000, (t2 - t1) * 1000, (t3 - t2) * 1000)))
+    # fetch_ms is only a network time when the page didn't come out of requests-cache
+    report['from_cache'] = getattr(r, 'from_cache', False)
     return report
 
 # --- UI EXECUTION ---
@@ -131,6 +230,11 @@ with st.sidebar:
         run_check = True
     else:
         run_check = False
+    force_refresh = st.button("🔄 FORCE REFRESH")
+    run_check = run_check or force_refresh
+    st.caption(f"RUN CHECK reuses fund results for up to {FUND_CACHE_TTL // 60} min and pages for up to "
+               f"{PAGE_CACHE_TTL // 60} min, so a newly published date can take up to "
+               f"{(FUND_CACHE_TTL + PAGE_CACHE_TTL) // 60} min to show. FORCE REFRESH refetches every page.")
     st.info(f"Time: {datetime.now(SYD_TZ).strftime('%H:%M')}")
     st.markdown("---")
     st.markdown("**Legend:**")
@@ -139,28 +243,45 @@ with st.sidebar:
     st.warning("⚠️ Tag not found")
 
 if run_check:
-    funds = get_all_tickers()
+    if force_refresh:
+        get_all_tickers.clear()
+        check_fund.clear()
+    funds = get_all_tickers(force_refresh)
     st.toast(f"Found {len(funds)} funds. Scanning...")
     
+    today_syd = datetime.now(SYD_TZ).date()
+    exp_dist_s = get_last_month_end(today_syd).strftime('%d %b %Y')
+
     results = []
     # Using Multi-threading
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_url = {executor.submit(check_fund, t): t for t in funds}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        future_to_url = {executor.submit(check_fund, t, today_syd, exp_dist_s, force_refresh): t for t in funds}
         for future in concurrent.futures.as_completed(future_to_url):
-            data = future.result()
+            try: data = future.result()
+            except:
+                data = new_report(future_to_url[future])
+                data['NAV'] = "❌ Error"
             results.append(data)
     
     results = sorted(results, key=lambda x: x['Ticker'])
-    df = pd.DataFrame(results)
+    raw = pd.DataFrame(results)
+    df = raw.drop(columns=PROFILE_COLS, errors='ignore').astype('string[pyarrow]')
     
-    def style_rows(val):
-        s = str(val)
-        if '🔴' in s: return 'background-color: #ffe6e6; color: #cc0000; font-weight: bold'
-        if '✅' in s: return 'color: green; font-weight: bold'
-        if '⚠️' in s: return 'color: orange'
-        return ''
-
-    st.dataframe(df.style.applymap(style_rows), use_container_width=True, height=1000)
+    # Column-wise styling: one vectorised match per status instead of a Python call per cell
+    def style_col(col):
+        return np.where(col.str.contains('🔴', regex=False), 'background-color: #ffe6e6; color: #cc0000; font-weight: bold',
+               np.where(col.str.contains('✅', regex=False), 'color: green; font-weight: bold',
+               np.where(col.str.contains('⚠️', regex=False), 'color: orange', '')))
+
+    st.dataframe(df.style.apply(style_col), use_container_width=True, height=1000)
     st.success("✨ Check Complete!")
+
+    with st.expander("Profile"):
+        prof = raw.reindex(columns=PROFILE_COLS)
+        live = prof[prof['from_cache'].eq(False)]
+        st.caption(f"Per-fund stage timings (ms), network fetches only: {len(live)} fetched, "
+                   f"{prof['from_cache'].eq(True).sum()} left out as requests-cache reads. "
+                   "Funds served by st.cache_data show the timings of the scan that filled the cache.")
+        st.dataframe(live[TIMING_COLS].describe(), use_container_width=True)
 else:
     st.info("👋 Ready.")